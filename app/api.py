@@ -1,12 +1,18 @@
 """API methods."""
 
 import os
-from datetime import timedelta, datetime
+import threading
+from datetime import timedelta
 from typing import Annotated
 
+from cachetools import TTLCache
 from fastapi import Body, Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import TypeAdapter
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from app.auth import auth_handler
@@ -14,25 +20,51 @@ from app.auth import crypto
 from app import model
 
 
-app_obj = FastAPI()
+# Comma separated list of allowed origins, e.g. the frontend URL.
+FRONTEND_ORIGINS = [
+    origin.strip() for origin in os.getenv("FRONTEND_ORIGIN", "").split(",")
+    if origin.strip()] or ["*"]
+
+app_obj = FastAPI(default_response_class=ORJSONResponse)
 app_obj.add_middleware(
     CORSMiddleware,
-    allow_origins=['*'],
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,  # Set to True if cookies are needed
-    allow_methods=["*"],  # Allow all methods (GET, POST, etc.)
-    allow_headers=["*"],  # Allow all headers
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
+# Statements are built once so every request reuses the same cached compiled
+# SQL; values are supplied as bound parameters at execution time.
+SCREENSHOTS_BY_OWNER = select(model.Screenshot).where(
+    model.Screenshot.owner_id == bindparam("oid")).order_by(
+        model.Screenshot.created_on.desc(), model.Screenshot.id.desc()
+    ).limit(bindparam("n"))
+SCREENSHOT_BY_EXTERNAL_ID = select(model.Screenshot).where(
+    model.Screenshot.external_id == bindparam("eid"))
+
+SCREENSHOT_LIST_ADAPTER = TypeAdapter(list[model.Screenshot])
+
+# Maximum number of screenshots accepted by a single batch request.
+MAX_SCREENSHOT_BATCH = 20
+
+# Screenshots recently read by external ID, bounded by the total size of the
+# cached images (64 MiB). Handlers run in the threadpool, so access goes
+# through the lock.
+_SHOT_CACHE = TTLCache(
+    maxsize=64 * 1024 * 1024, ttl=60, getsizeof=lambda s: len(s.img))
+_SHOT_CACHE_LOCK = threading.Lock()
+
+
+def _email_taken_exception():
+    return HTTPException(status_code=400, detail="Email already registered")
 
-@app_obj.on_event("startup")
-def on_startup():
-    model.create_db_and_tables()
 
 # route handlers
 
 
 @app_obj.post("/token")
-async def login(
+def login(
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
         session: Session = Depends(model.get_db_session)):
     """
@@ -68,8 +100,13 @@ async def login(
     return model.Token(access_token=token, token_type="bearer")
 
 
-@app_obj.get("/screenshots", tags=["screenshots"], response_model=list[model.Screenshot])
-async def get_screenshots(
+@app_obj.get(
+    "/screenshots",
+    tags=["screenshots"],
+    response_model=None,
+    response_class=ORJSONResponse,
+    responses={200: {"model": list[model.Screenshot]}})
+def get_screenshots(
     num_screenshots: int = 3,
     session: Session = Depends(model.get_db_session),
     current_user_id: model.UserId = Depends(auth_handler.get_current_user_id)):
@@ -89,17 +126,22 @@ async def get_screenshots(
             Retrieved using Depends from `auth_handler.get_current_user_id`.
 
     Returns:
-        A list of `model.Screenshot` objects representing the user's screenshots.
+        A JSON response with the list of `model.Screenshot` objects
+        representing the user's screenshots.
     """
-    statement = select(model.Screenshot).where(
-        model.Screenshot.owner_id == current_user_id.id).order_by(
-            model.Screenshot.created_on.desc()
-        ).limit(num_screenshots)
-    return session.exec(statement)
-
-
-@app_obj.get("/screenshots/{screenshot_id}", tags=["screenshots"], response_model=model.Screenshot)
-async def get_single_screenshot(
+    screenshots = session.exec(
+        SCREENSHOTS_BY_OWNER,
+        params={"oid": current_user_id.id, "n": num_screenshots}).all()
+    return ORJSONResponse(
+        SCREENSHOT_LIST_ADAPTER.dump_python(screenshots, mode="json"))
+
+
+@app_obj.get(
+    "/screenshots/{screenshot_id}",
+    tags=["screenshots"],
+    response_model=model.Screenshot,
+    response_class=ORJSONResponse)
+def get_single_screenshot(
     *,
     session: Session = Depends(model.get_db_session),
     screenshot_id: str):
@@ -123,16 +165,26 @@ async def get_single_screenshot(
     Raises:
         HTTPException: If the screenshot with the provided ID is not found (404 Not Found).
     """
-    q = select(model.Screenshot).where(
-        model.Screenshot.external_id == screenshot_id)
-    screenshot = session.exec(q).first()
+    with _SHOT_CACHE_LOCK:
+        screenshot = _SHOT_CACHE.get(screenshot_id)
+    if screenshot:
+        return screenshot
+    screenshot = session.exec(
+        SCREENSHOT_BY_EXTERNAL_ID, params={"eid": screenshot_id}).first()
     if not screenshot:
         raise HTTPException(status_code=404, detail="Screenshot not found")
+    if len(screenshot.img) <= _SHOT_CACHE.maxsize:
+        with _SHOT_CACHE_LOCK:
+            _SHOT_CACHE[screenshot_id] = screenshot
     return screenshot
 
 
-@app_obj.post("/screenshots", tags=["screenshots"], response_model=model.Screenshot)
-async def add_screenshots(
+@app_obj.post(
+    "/screenshots",
+    tags=["screenshots"],
+    response_model=model.Screenshot,
+    response_class=ORJSONResponse)
+def add_screenshots(
     *,
     session: Session = Depends(model.get_db_session),
     current_user_id: model.UserId = Depends(auth_handler.get_current_user_id),
@@ -158,19 +210,69 @@ async def add_screenshots(
         A `model.Screenshot` object representing the newly created screenshot.
     """
     screenshot_db = model.Screenshot.model_validate(
-        screenshot, update={
-            "owner_id": current_user_id.id,
-            "created_on": datetime.now()
-            })
+        screenshot, update={"owner_id": current_user_id.id})
     screenshot_db.external_id = crypto.generate_random_base64_string(32)
     session.add(screenshot_db)
     session.commit()
-    session.refresh(screenshot_db)
     return screenshot_db
 
 
+@app_obj.post(
+    "/screenshots/batch",
+    tags=["screenshots"],
+    response_model=list[str],
+    response_class=ORJSONResponse)
+def add_screenshots_batch(
+    *,
+    session: Session = Depends(model.get_db_session),
+    current_user_id: model.UserId = Depends(auth_handler.get_current_user_id),
+    screenshots: list[model.ScreenshotCreate]):
+    """
+    Creates several screenshots for the currently authenticated user at once.
+
+    This API endpoint works like `add_screenshots` but inserts all the
+    provided screenshots in a single bulk insert and transaction, so the
+    authentication and commit costs are paid once per batch.
+
+    Args:
+        session: A SQLAlchemy database session object. Obtained using
+            Depends from `model.get_db_session`.
+        current_user_id: An instance of `model.UserId` containing
+            the authenticated user's ID.
+            Retrieved using Depends from `auth_handler.get_current_user_id`.
+        screenshots: A list of `model.ScreenshotCreate` instances containing
+            the data for the new screenshots.
+
+    Returns:
+        The external IDs of the created screenshots, in the same order as
+        the provided screenshots.
+
+    Raises:
+        HTTPException: If more than `MAX_SCREENSHOT_BATCH` screenshots are
+            provided (413 Request Entity Too Large).
+    """
+    if len(screenshots) > MAX_SCREENSHOT_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_SCREENSHOT_BATCH} screenshots per batch")
+    now = model.utc_now()
+    external_ids = [
+        crypto.generate_random_base64_string(32) for _ in screenshots]
+    session.bulk_insert_mappings(model.Screenshot, [
+        {
+            **screenshot.model_dump(),
+            "owner_id": current_user_id.id,
+            "external_id": external_id,
+            "created_on": now,
+        }
+        for screenshot, external_id in zip(screenshots, external_ids)
+    ])
+    session.commit()
+    return external_ids
+
+
 @app_obj.post("/user/signup", tags=["user"])
-async def create_user(
+def create_user(
     *,
     session: Session = Depends(model.get_db_session),
     user: model.UserCreate = Body(...)):
@@ -190,13 +292,23 @@ async def create_user(
     Returns:
         A `model.Token` object containing the access token and token type
         upon successful registration.
+
+    Raises:
+        HTTPException: If the email is already registered (400 Bad Request).
     """
+    if session.exec(
+            auth_handler.USER_BY_EMAIL, params={"email": user.email}).first():
+        raise _email_taken_exception()
     db_user = model.User.model_validate(user)
     # Hash password before saving it
     db_user.password = crypto.get_password_hash(db_user.password)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        # A concurrent signup registered the same email first.
+        session.rollback()
+        raise _email_taken_exception() from exc
     return model.Token(
         access_token=auth_handler.create_access_token(db_user),
         token_type="bearer")
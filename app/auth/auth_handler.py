@@ -1,13 +1,17 @@
 """ Handles authentication.
 """
 
+import hashlib
 import os
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import timedelta
 from typing import Annotated, Union
 
 import jwt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import bindparam
 from sqlmodel import select
 
 from app import model
@@ -15,15 +19,26 @@ from app.auth import crypto
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
+if not JWT_SECRET or not JWT_ALGORITHM:
+    raise RuntimeError("JWT_SECRET and JWT_ALGORITHM must be set")
+
+_ALGS = [JWT_ALGORITHM]
+_DEFAULT_EXP = timedelta(minutes=30)
+_jwt = jwt.PyJWT()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Validated tokens, keyed by a digest of the raw token. Entries live at most
+# 30 seconds and never past the token's own expiration.
+_tok_cache = TTLCache(maxsize=10_000, ttl=30)
+
+USER_BY_EMAIL = select(model.User).where(model.User.email == bindparam("email"))
+
 
 def check_and_get_user(data: model.UserLogin, session: model.Session):
     """ Returns the User object if the credentials are correct or None.
     """
-    q = select(model.User).where(model.User.email == data.email)
-    user = session.exec(q).first()
+    user = session.exec(USER_BY_EMAIL, params={"email": data.email}).first()
     if user:
         if crypto.verify_password(data.password, user.password):
             return user
@@ -36,12 +51,9 @@ def create_access_token(user: model.User, expires_delta: Union[timedelta, None]
     to_encode = {
         "sub": {'id': user.id, 'email': user.email}
     }
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=30)
+    expire = int(time.time() + (expires_delta or _DEFAULT_EXP).total_seconds())
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    encoded_jwt = _jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
@@ -49,23 +61,36 @@ def decode_jwt(token: str) -> dict:
     """ Decodes JWT token.
     """
     try:
-        decoded_token = jwt.decode(
-            token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        decoded_token = _jwt.decode(token, JWT_SECRET, algorithms=_ALGS)
         return decoded_token
     except jwt.InvalidTokenError:
         return None
 
 
-async def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]):
-    """ Dependency for authentication that returns the user id.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+async def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]):
+    """ Dependency for authentication that returns the user id.
+
+    FastAPI caches the result per request, so callers must keep the default
+    use_cache=True to decode the token at most once per request.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _tok_cache.get(key)
+    if cached:
+        user_id, expire = cached
+        if expire > time.time():
+            return user_id
+        _tok_cache.pop(key, None)
     decoded_token = decode_jwt(token)
     if not decoded_token:
-        raise credentials_exception
+        raise _credentials_exception()
     user_id = model.UserId(**decoded_token['sub'])
+    _tok_cache[key] = (user_id, decoded_token['exp'])
     return user_id
@@ -1,12 +1,12 @@
 """ Basic crypto and hash utilities.
 """
 
-import base64
 import os
+import secrets
 
-from passlib.context import CryptContext
+import bcrypt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 
 def verify_password(plain_password: str, hashed_password: str):
@@ -20,7 +20,7 @@ def verify_password(plain_password: str, hashed_password: str):
     Returns:
         True if the passwords match, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
 
 def get_password_hash(password: str):
@@ -33,7 +33,8 @@ def get_password_hash(password: str):
     Returns:
         The hashed password.
     """
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(
+        password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
 
 
 def generate_random_base64_string(length: int):
@@ -43,13 +44,7 @@ def generate_random_base64_string(length: int):
         length: The desired length of the random string (in bytes).
 
     Returns:
-        A string containing the random data encoded in base64 (URL-safe).
+        A string containing the random data encoded in base64 (URL-safe),
+        without padding.
     """
-    # Generate random bytes using os.urandom()
-    random_bytes = os.urandom(length)
-
-    # Encode the random bytes in base64 (URL-safe) format
-    encoded_string = base64.urlsafe_b64encode(random_bytes).decode()
-
-    # Remove trailing newline character (optional)
-    return encoded_string.rstrip("\n")
+    return secrets.token_urlsafe(length)
@@ -2,21 +2,45 @@
 """
 
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Union
 
 from pydantic import BaseModel, EmailStr
+from sqlalchemy import func, make_url
 from sqlmodel import Field, Session, SQLModel, create_engine
 
-connect_args = {"check_same_thread": False}
+DB_URL = os.getenv("DB_URL")
+
+connect_args = {}
+pool_args = {"pool_pre_ping": True, "pool_recycle": 3600}
+db_url = make_url(DB_URL)
+is_sqlite = db_url.get_backend_name() == "sqlite"
+if is_sqlite:
+    # SQLite-only option; other drivers reject it.
+    connect_args["check_same_thread"] = False
+# In-memory SQLite uses SingletonThreadPool, which rejects QueuePool sizing.
+if not (is_sqlite and db_url.database in (None, "", ":memory:")):
+    pool_args.update(pool_size=20, max_overflow=10, pool_timeout=30)
 engine = create_engine(
-    os.getenv("DB_URL"),
-    echo=True,
-    connect_args=connect_args)
+    DB_URL,
+    echo=False,
+    connect_args=connect_args,
+    **pool_args)
+
+def utc_now():
+    """Returns the current UTC time as a naive datetime.
+
+    Matches the naive UTC value the database default (func.now()) stores.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 def get_db_session():
-    """Returns DB session."""
-    with Session(engine) as session:
+    """Returns DB session.
+
+    Objects are not expired on commit, so values written by a handler
+    (including generated primary keys) can be read back without a new query.
+    """
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
 def create_db_and_tables():
@@ -31,7 +55,7 @@ class TokenData(BaseModel):
     username: Union[str, None] = None
 
 class UserLogin(SQLModel):
-    email: EmailStr = Field(...)
+    email: EmailStr = Field(..., index=True, unique=True)
     password: str = Field(...)
 
 class UserId(SQLModel):
@@ -59,8 +83,10 @@ class ScreenshotCreate(SQLModel):
 
 class ScreenshotBase(ScreenshotCreate):
     owner_id: int | None = Field(default=None, foreign_key="user.id")
-    external_id: str = Field(default = None)
-    created_on: datetime
+    external_id: str = Field(default=None, index=True, unique=True)
+    created_on: datetime = Field(
+        default_factory=utc_now,
+        sa_column_kwargs={"server_default": func.now()})
     #owner: User | None = Relationship(back_populates="screenshots")
 
 class Screenshot(ScreenshotBase, table=True):
@@ -1,6 +1,12 @@
+import os
+
 import uvicorn
 from dotenv import load_dotenv
 
 if __name__ == "__main__":
     load_dotenv()
+    if os.getenv("CREATE_TABLES") == "1":
+        # Imported after load_dotenv since the engine reads DB_URL on import.
+        from app import model
+        model.create_db_and_tables()
     uvicorn.run("app.api:app_obj", host="0.0.0.0", port=8081, reload=True)